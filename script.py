@@ -1,70 +1,356 @@
 #!/usr/bin/env python3
 """
 Scrape Dataset 9 file list from DOJ website and download PDFs in batches.
-Uses Playwright to handle age verification and pagination.
+Listing pages and PDFs are fetched over plain HTTP; Playwright is only brought in
+to find a JSON listing endpoint and to clear challenges that block HTTP.
 """
  
 import asyncio
+import atexit
+import hashlib
 import json
+import os
 import re
-import random
+import time
+from collections import deque
 from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 from playwright.async_api import async_playwright
 import aiohttp
+import aiofiles
+
+try:
+    import orjson
+except ImportError:  # optional speedup; falls back to the stdlib encoder
+    orjson = None
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # optional speedup; falls back to LINK_RE
+    HTMLParser = None
+
+try:
+    import uvloop
+except ImportError:  # optional speedup (not available on Windows); falls back to asyncio's loop
+    uvloop = None
  
-BASE_URL = "https://www.justice.gov/epstein/doj-disclosures/data-set-9-files"
+BASE_HOST = "https://www.justice.gov"
+BASE_URL = f"{BASE_HOST}/epstein/doj-disclosures/data-set-9-files"
 OUTPUT_DIR = Path(r"D:\Epstein Files\Dataset9")
-INDEX_FILE = OUTPUT_DIR / "dataset9_index.json"
+INDEX_FILE = OUTPUT_DIR / "dataset9_index.jsonl"
+DOWNLOADED_LOG = OUTPUT_DIR / "dataset9_downloaded.jsonl"
+LEGACY_INDEX_FILE = OUTPUT_DIR / "dataset9_index.json"
+FILENAMES_FILE = OUTPUT_DIR / "dataset9_filenames.txt"
+PROFILE_DIR = OUTPUT_DIR / ".profile"  # persistent Chromium profile (cache + cookies)
 STATE_FILE = OUTPUT_DIR / "dataset9_state.json"
+STATE_SCHEMA_VERSION = 1
 BATCH_SIZE = None  # None means no per-batch limit; scrape/download everything found
-HEADLESS = False
-SLOW_MO_MS = 50
+HEADLESS = True
+SLOW_MO_MS = 0
+BLOCKED_RESOURCE_TYPES = ("image", "font", "stylesheet", "media")
 SCRAPE_RETRIES = 5
+SCRAPE_CONCURRENCY = 16  # listing pages in flight at once
+SCRAPE_RATE = 8  # listing requests per second while the server isn't pushing back
+SCRAPE_WINDOW_RECOVER_PAGES = 50  # clean pages before a narrowed window doubles again
 DOWNLOAD_RETRIES = 5
+DOWNLOAD_CONCURRENCY = 8  # files in flight at once, shared by every batch in a run
+DOWNLOAD_RATE = 16  # download requests per second; only bites once the server throttles us
+DOWNLOAD_QUEUE_SIZE = 128  # scraped files waiting for a downloader before the scraper pauses
 PAGE_TIMEOUT_MS = 60000
 DOWNLOAD_TIMEOUT_MS = 120000
-LINK_RE = re.compile(r'href="([^"]*/epstein/files/[^"]+\.pdf)"', re.IGNORECASE)
+HTTP_CONNECTIONS = 32
+HTTP_CONNECTIONS_PER_HOST = 16
+HTTP_KEEPALIVE_S = 75
+HTTP_DNS_CACHE_S = 300
+HTTP_READ_BUFSIZE = 10 * 1024 * 1024  # lets a fast link burst without stalling; also caps write size
+LINK_SELECTOR = 'a[href*="/epstein/files/"][href$=".pdf"]'  # used when selectolax is installed
+# Byte patterns so listing bodies from aiohttp are scanned without decoding first.
+LINK_RE = re.compile(rb'href="([^"]*/epstein/files/[^"]+\.pdf)"')
+LAST_PAGE_RE = re.compile(rb'<a\b[^>]*aria-label="Last page"[^>]*>')
+NEXT_PAGE_RE = re.compile(rb'<a\b[^>]*(?:aria-label="Next page"|rel="next")')
+PAGE_PARAM_RE = re.compile(rb'[?&](?:amp;)?page=(\d+)')
+# Case-insensitive searches, so a page is never lowercased into a second copy.
+DENY_RE = re.compile(rb"you don't have permission to access|errors\.edgesuite\.net", re.I)
+REFERENCE_RE = re.compile(rb"reference #", re.I)
+ACCESS_DENIED_RE = re.compile(rb"access denied", re.I)
+MANUAL_MAX_PAGE = 20500  # Dataset 9 has ~20,450 pages
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
 EXTRA_HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
 }
-DOWNLOAD_CHUNK_SIZE = 1_048_576  # 1MB chunks to avoid large memory use
+INDEX_FLUSH_EVERY = 50  # buffered index lines that force an immediate write
+INDEX_FLUSH_INTERVAL_S = 2.0
+PRETTY_JSON = False  # indent the state file for reading by hand (--pretty)
+
+
+def _loads(data):
+    """Decode JSON from bytes or str, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 def _load_json(path, default):
     if path.exists():
-        with open(path, "r") as f:
-            return json.load(f)
+        return _loads(path.read_bytes())
     return default
 
 
-def _save_json(path, data):
+def _atomic_write(path, write):
+    """Write via a fsynced temp file and os.replace, so readers never see a partial file."""
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if os.name == "posix":
+        # The rename lives in the directory; sync that too or a crash can undo it.
+        fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _dumps(data, pretty=False):
+    """Encode to JSON bytes, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(data, indent=2).encode("utf-8")
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
 
 
-def _load_index():
-    return _load_json(INDEX_FILE, [])
+def _save_json(path, data):
+    _atomic_write(path, lambda f: f.write(_dumps(data, PRETTY_JSON)))
+
+
+def _read_jsonl(path):
+    """Returns (records, clean); clean is False if a torn line had to be dropped."""
+    records = []
+    clean = True
+    if not path.exists():
+        return records, clean
+    # Bytes in, so a line torn mid-character fails to decode like any other torn line.
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(_loads(line))
+            except ValueError:
+                # A crash mid-append leaves at most one torn line at the end.
+                clean = False
+    return records, clean
+
+
+class LineBuffer:
+    """Collects lines appended to the index files and writes them out in batches.
+
+    run() is the background flusher; it coalesces whatever arrives within one
+    interval into a single write per file. Reaching flush_every lines writes at once.
+    """
+
+    def __init__(self, flush_every, interval):
+        self.flush_every = flush_every
+        self.interval = interval
+        self._lines = {}
+        self._count = 0
+        self._dirty = asyncio.Event()
+
+    def append(self, path, line):
+        self._lines.setdefault(path, []).append(line)
+        self._count += 1
+        if self._count >= self.flush_every:
+            self.flush()
+        else:
+            self._dirty.set()
 
+    def discard(self, *paths):
+        for path in paths:
+            self._count -= len(self._lines.pop(path, []))
 
-def _save_index(all_files):
-    _save_json(INDEX_FILE, all_files)
+    def flush(self):
+        lines, self._lines = self._lines, {}
+        self._count = 0
+        for path, chunk in lines.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "ab") as f:
+                f.writelines(chunk)
 
+    async def run(self):
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.interval)
+            self._dirty.clear()
+            self.flush()
 
-def _load_state():
-    return _load_json(STATE_FILE, {"next_page": 0, "max_page": None})
+
+_INDEX_BUFFER = LineBuffer(INDEX_FLUSH_EVERY, INDEX_FLUSH_INTERVAL_S)
+# Last resort if the run dies before its finally gets to compact the index.
+atexit.register(_INDEX_BUFFER.flush)
+
+
+def _append_jsonl(path, record):
+    _INDEX_BUFFER.append(path, _dumps(record) + b"\n")
+
+
+# Index records are {"p": path, "d": 0|1} plus "m": 1 for files the server 404s.
+# The path is relative to BASE_HOST when the link pointed there; the URL and
+# filename are derived from it on demand instead of being stored.
+
+def _href_path(href):
+    # Fast paths for the two shapes listing pages actually use; urlsplit handles the rest.
+    if "#" not in href:
+        if href.startswith("/") and not href.startswith("//"):
+            return href
+        if href.startswith(BASE_HOST + "/"):
+            return href[len(BASE_HOST):]
+    parts = urlsplit(href)
+    # Protocol-relative links ("//host/...") have a netloc but no scheme.
+    if parts.netloc and f"{parts.scheme or 'https'}://{parts.netloc}" != BASE_HOST:
+        return href
+    return urlunsplit(("", "", parts.path, parts.query, ""))
+
+
+def _record_url(record):
+    path = record["p"]
+    if path.startswith("//"):
+        return urljoin(BASE_HOST, path)
+    return BASE_HOST + path if path.startswith("/") else path
+
+
+def _record_filename(record):
+    return record["p"].rpartition("/")[2]
 
 
-def _save_state(state):
-    _save_json(STATE_FILE, state)
+def _compact_record(record):
+    """Convert an older {"filename", "url", "downloaded", "missing"} record."""
+    compact = {"p": _href_path(record["url"]), "d": 1 if record.get("downloaded") else 0}
+    if record.get("missing"):
+        compact["m"] = 1
+    return compact
+
+
+def _load_index():
+    """Load the index, replaying download updates on top of the appended records."""
+    if not INDEX_FILE.exists() and LEGACY_INDEX_FILE.exists():
+        print(f"Migrating {LEGACY_INDEX_FILE.name} to {INDEX_FILE.name}...")
+        _compact_index([_compact_record(r) for r in _load_json(LEGACY_INDEX_FILE, [])])
+
+    all_files, clean = _read_jsonl(INDEX_FILE)
+    if any("p" not in record for record in all_files):
+        all_files = [record if "p" in record else _compact_record(record) for record in all_files]
+        clean = False
+
+    updates, log_clean = _read_jsonl(DOWNLOADED_LOG)
+    missing = {}
+    for update in updates:
+        name = _record_filename(update) if "p" in update else update["filename"]
+        missing[name] = bool(update.get("m") or update.get("missing"))
+    for record in all_files:
+        name = _record_filename(record)
+        if name in missing:
+            record["d"] = 1
+            if missing[name]:
+                record["m"] = 1
+    if not (clean and log_clean):
+        # Rewrite torn or old-format files (the log is folded in and removed);
+        # appending after a torn line would glue the next record onto it.
+        _compact_index(all_files)
+    return all_files
+
+
+def _append_index(record):
+    _append_jsonl(INDEX_FILE, record)
+    _INDEX_BUFFER.append(FILENAMES_FILE, (_record_filename(record) + "\n").encode("utf-8"))
+
+
+def _load_file_set(all_files):
+    """Known filenames, read from their own one-per-line file rather than the index."""
+    if FILENAMES_FILE.exists():
+        with open(FILENAMES_FILE, "r", encoding="utf-8") as f:
+            file_set = {line.rstrip("\n") for line in f if line.strip()}
+        if len(file_set) == len(all_files):
+            return file_set
+    # Missing or out of step with the index (e.g. a crash between appends); rebuild.
+    file_set = {_record_filename(f) for f in all_files}
+    _atomic_write(FILENAMES_FILE, lambda f: f.writelines((name + "\n").encode("utf-8") for name in file_set))
+    return file_set
+
+
+def _mark_downloaded(file_info, missing=False):
+    if file_info["d"] and (file_info.get("m") or not missing):
+        return  # already recorded; don't grow the log on a resume
+    file_info["d"] = 1
+    update = {"p": file_info["p"], "d": 1}
+    if missing:
+        file_info["m"] = 1
+        update["m"] = 1
+    _append_jsonl(DOWNLOADED_LOG, update)
+
+
+def _compact_index(all_files):
+    """Rewrite the index in full and fold the download log into it."""
+    # all_files already holds anything still buffered for these two files.
+    _INDEX_BUFFER.discard(INDEX_FILE, DOWNLOADED_LOG)
+    _INDEX_BUFFER.flush()
+
+    def write(f):
+        for record in all_files:
+            f.write(_dumps(record) + b"\n")
+
+    _atomic_write(INDEX_FILE, write)
+    if DOWNLOADED_LOG.exists():
+        DOWNLOADED_LOG.unlink()
+
+
+def _base_url_hash():
+    return hashlib.sha256(BASE_URL.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_state():
+    state = _load_json(STATE_FILE, {"next_page": 0, "max_page": None})
+    # Older state files predate the stamp; adopt them for the current BASE_URL.
+    expected = {"schema_version": STATE_SCHEMA_VERSION, "base_url_hash": _base_url_hash()}
+    for key, value in expected.items():
+        found = state.setdefault(key, value)
+        if found != value:
+            raise SystemExit(
+                f"{STATE_FILE} has {key}={found!r}, expected {value!r}. "
+                "It belongs to a different BASE_URL or script version; move it aside to start over."
+            )
+    return state
+
+
+async def _save_state(state):
+    # Records must reach disk before next_page moves past the pages they came from.
+    _INDEX_BUFFER.flush()
+    # The fsync can stall for a while; keep it off the loop so downloads keep streaming.
+    await asyncio.to_thread(_save_json, STATE_FILE, state)
 
 
 def _existing_file_names():
     if not OUTPUT_DIR.exists():
         return set()
-    return {p.name for p in OUTPUT_DIR.glob("*") if p.is_file()}
+    # scandir answers is_file() from the directory entry, without a stat per file.
+    with os.scandir(OUTPUT_DIR) as entries:
+        return {e.name for e in entries if e.is_file(follow_symlinks=False)}
+
+
+_EXISTING = None
+
+
+def _existing_files():
+    """Names in OUTPUT_DIR, scanned once per run and kept current by the downloader."""
+    global _EXISTING
+    if _EXISTING is None:
+        _EXISTING = _existing_file_names()
+    return _EXISTING
 
 
 def _cookie_dict_from_list(cookie_list):
@@ -88,40 +374,201 @@ def _age_cookies():
 
 
 async def _add_age_cookies(context):
-    await context.add_cookies(_age_cookies())
+    # A persistent profile keeps the cookie from earlier runs; only add it when missing.
+    names = {c["name"] for c in await context.cookies(BASE_URL)}
+    if "justiceGovAgeVerified" not in names:
+        await context.add_cookies(_age_cookies())
+
+
+async def _block_heavy_resources(route):
+    # Only the HTML is ever read, so skip assets the page would otherwise pull in.
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _as_bytes(html):
+    if isinstance(html, str):
+        return html.encode("utf-8")
+    return html or b""
 
 
 def _extract_links_from_html(html):
-    matches = LINK_RE.findall(html or "")
-    seen = set()
+    # dict.fromkeys dedupes while keeping page order.
+    if HTMLParser is not None:
+        tree = HTMLParser(_as_bytes(html))
+        return list(dict.fromkeys(node.attributes["href"] for node in tree.css(LINK_SELECTOR)))
+    return [href.decode("utf-8") for href in dict.fromkeys(LINK_RE.findall(_as_bytes(html)))]
+
+
+def _extract_links_from_json(data):
+    """Walk a decoded JSON payload and pull out file links, rendered markup included."""
     links = []
-    for href in matches:
-        if href not in seen:
-            seen.add(href)
-            links.append(href)
-    return links
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, str) and "/epstein/files/" in node:
+            if "href=" in node:
+                links.extend(_extract_links_from_html(node))
+            elif node.lower().endswith(".pdf"):
+                links.append(node)
+    return list(dict.fromkeys(links))
+
+
+def _extract_listing_links(body, is_json):
+    if is_json:
+        try:
+            return _extract_links_from_json(_loads(body))
+        except ValueError:
+            pass
+    return _extract_links_from_html(body)
 
 
 def _save_debug_html(html, page_num):
     if not html:
         return
     debug_path = OUTPUT_DIR / f"debug_page_{page_num}.html"
-    with open(debug_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    with open(debug_path, "wb") as f:
+        f.write(_as_bytes(html))
 
 
 def _is_access_denied(html):
     if not html:
         return False
-    lowered = html.lower()
+    data = _as_bytes(html)
     # Be strict to avoid false positives from the age-gate hidden error block.
-    if "you don't have permission to access" in lowered:
-        return True
-    if "errors.edgesuite.net" in lowered:
+    if DENY_RE.search(data):
         return True
-    if "reference #" in lowered and "access denied" in lowered:
-        return True
-    return False
+    return bool(REFERENCE_RE.search(data) and ACCESS_DENIED_RE.search(data))
+
+
+def _max_page_from_html(html):
+    tag = LAST_PAGE_RE.search(_as_bytes(html))
+    if not tag:
+        return None
+    match = PAGE_PARAM_RE.search(tag.group(0))
+    return int(match.group(1)) if match else None
+
+
+def _page_url(base_url, page_num):
+    parts = urlsplit(base_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "page"]
+    query.append(("page", str(page_num)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _http_headers():
+    return {"User-Agent": USER_AGENT, **EXTRA_HEADERS}
+
+
+def _http_session():
+    """One pooled keep-alive session for listing pages and downloads for the whole run.
+
+    The age cookie stands in for the gate. Listing requests pass their own shorter timeout.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONNECTIONS,
+        limit_per_host=HTTP_CONNECTIONS_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_S,
+        ttl_dns_cache=HTTP_DNS_CACHE_S,
+        enable_cleanup_closed=True
+    )
+    return aiohttp.ClientSession(
+        headers=_http_headers(),
+        timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT_MS / 1000 + 60),
+        cookies=_cookie_dict_from_list(_age_cookies()),
+        connector=connector,
+        read_bufsize=HTTP_READ_BUFSIZE
+    )
+
+
+def _retry_after_seconds(resp, default):
+    value = resp.headers.get("Retry-After", "")
+    return int(value) if value.isdigit() else default
+
+
+class TokenBucket:
+    """Adaptive rate limiter: halves its rate when throttled, doubles back after a run of successes."""
+
+    def __init__(self, rate, burst, min_rate=0.5, recover_after=50):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recover_after = recover_after
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.next_available = 0.0
+        self.successes = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.next_available:
+                    await asyncio.sleep(self.next_available - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self, retry_after=None):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+        self.successes = 0
+        if retry_after:
+            self.next_available = max(self.next_available, time.monotonic() + retry_after)
+        # Refill only from the end of the pause, or the first acquire after it gets a full burst.
+        self.updated = max(time.monotonic(), self.next_available)
+
+    def succeed(self):
+        self.successes += 1
+        if self.successes >= self.recover_after and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate * 2)
+            self.successes = 0
+
+
+# Shared by every download in the run, so one 429 slows them all instead of just its own retry.
+_DOWNLOAD_BUCKET = TokenBucket(DOWNLOAD_RATE, DOWNLOAD_CONCURRENCY)
+
+
+async def _fetch_listing_html(session, sem, bucket, page_num, base_url=BASE_URL):
+    """Fetch one listing page body as bytes. Returns None if every retry failed."""
+    url = _page_url(base_url, page_num)
+    timeout = aiohttp.ClientTimeout(total=PAGE_TIMEOUT_MS / 1000)
+    for attempt in range(1, SCRAPE_RETRIES + 1):
+        delay = 2 ** attempt
+        try:
+            await bucket.acquire()
+            async with sem:
+                async with session.get(url, allow_redirects=True, timeout=timeout) as resp:
+                    if resp.status in (429, 503):
+                        delay = _retry_after_seconds(resp, delay)
+                        bucket.penalize(delay)
+                        delay = 0  # the bucket now holds every request back
+                        raise RuntimeError(f"HTTP {resp.status}")
+                    body = await resp.read()
+                    # 403 bodies are handed back so the caller can run _is_access_denied.
+                    if resp.status not in (200, 403):
+                        raise RuntimeError(f"HTTP {resp.status}")
+                    if resp.status == 200:
+                        bucket.succeed()
+                    return body
+        except Exception as e:
+            print(f"  Page {page_num} attempt {attempt} failed: {e}")
+            # Back off outside the semaphore so other pages keep flowing.
+            await asyncio.sleep(delay)
+    return None
 
 
 async def _maybe_accept_age_gate(page):
@@ -141,26 +588,17 @@ async def _maybe_accept_age_gate(page):
                     if await btn.count() > 0:
                         await btn.first.click()
                         break
-            await page.wait_for_load_state("networkidle")
+            await page.wait_for_load_state("domcontentloaded")
             return True
     except Exception:
         return False
     return False
 
 
-async def _ensure_age_verified(page):
-    try:
-        await page.goto(BASE_URL, timeout=PAGE_TIMEOUT_MS)
-        await page.wait_for_load_state("domcontentloaded")
-        await _maybe_accept_age_gate(page)
-    except Exception:
-        pass
-
-
-async def _load_dataset_page(page, page_num):
+async def _load_dataset_page(page, page_num, check_gate=True):
     await page.goto(f"{BASE_URL}?page={page_num}", timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded")
     await page.wait_for_load_state("domcontentloaded")
-    accepted = await _maybe_accept_age_gate(page)
+    accepted = check_gate and await _maybe_accept_age_gate(page)
     if accepted:
         await page.goto(f"{BASE_URL}?page={page_num}", timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded")
         await page.wait_for_load_state("domcontentloaded")
@@ -174,277 +612,630 @@ async def _page_is_access_denied(page):
         return False
 
 
-async def _collect_links_from_page(page):
-    links = []
-    link_handles = await page.query_selector_all('a[href*="/epstein/files/"]')
-    for handle in link_handles:
-        href = await handle.get_attribute("href")
-        if href:
-            links.append(href)
-    if links:
-        return links
-    html = await page.content()
-    return _extract_links_from_html(html)
+async def _click_next_page(page):
+    """Click the pager's Next link; returns False when there isn't one."""
+    next_btn = page.get_by_role("link", name="Next page")
+    if await next_btn.count() == 0:
+        next_btn = page.locator('a[aria-label="Next page"]')
+    if await next_btn.count() == 0:
+        return False
+    await next_btn.first.click()
+    await page.wait_for_load_state("domcontentloaded")
+    return True
+
+
+class BrowserSession:
+    """One Chromium context shared by every batch in a run, launched on first use."""
+
+    def __init__(self):
+        self._playwright = None
+        self.context = None
+        self.page = None
+        # Once the gate is passed the cookie keeps it away, so stop probing the DOM
+        # for it on every navigation. Cleared again when a page comes back denied.
+        self.age_verified = False
+
+    async def start(self):
+        if self.context is not None:
+            return self.page
+        self._playwright = await async_playwright().start()
+        # A persistent profile lets Chromium's HTTP cache and cookies carry over between runs.
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        self.context = await self._playwright.chromium.launch_persistent_context(
+            user_data_dir=str(PROFILE_DIR),
+            headless=HEADLESS,
+            slow_mo=SLOW_MO_MS,
+            user_agent=USER_AGENT,
+            locale="en-US",
+            timezone_id="America/New_York",
+            extra_http_headers=EXTRA_HEADERS
+        )
+        await self.context.route("**/*", _block_heavy_resources)
+        await _add_age_cookies(self.context)
+        # The cookie already asserts verification, so skip the probe navigation to BASE_URL.
+        self.age_verified = True
+        self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+        return self.page
+
+    async def cookies(self):
+        await self.start()
+        return await self.context.cookies()
+
+    async def close(self):
+        if self.context is not None:
+            await self.context.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._playwright = None
+        self.context = None
+        self.page = None
+        self.age_verified = False
+
+
+async def _discover_json_endpoint(browser, session):
+    """Load page 0 once and return the URL of any JSON response that lists files.
+
+    The browser's cookies go to the HTTP session and the browser is closed before returning.
+    """
+    try:
+        page = await browser.start()
+    except Exception as e:
+        # Plain HTTP can still do the whole job without Chromium.
+        print(f"  Could not start the browser: {e}")
+        return None
+    captured = []
+    on_response = captured.append
+    page.on("response", on_response)
+    try:
+        await _load_dataset_page(page, 0, check_gate=not browser.age_verified)
+        await page.wait_for_load_state("networkidle")
+    except Exception:
+        pass
+    finally:
+        page.remove_listener("response", on_response)
 
+    endpoint = None
+    for resp in captured:
+        if "application/json" not in (resp.headers.get("content-type") or ""):
+            continue
+        try:
+            data = await resp.json()
+        except Exception:
+            continue
+        if _extract_links_from_json(data):
+            endpoint = resp.url
+            break
+    session.cookie_jar.update_cookies(_cookie_dict_from_list(await browser.cookies()))
+    await browser.close()
+    return endpoint
+
+
+def _add_new_records(links, all_files, file_set, existing_files, new_files, batch_size):
+    """Append unseen links to the index; returns the records added for this page."""
+    page_new_files = []
+    for href in links:
+        path = _href_path(href)
+        filename = path.rpartition("/")[2]
+        if filename not in file_set:
+            file_set.add(filename)
+            record = {"p": path, "d": 1 if filename in existing_files else 0}
+            all_files.append(record)
+            _append_index(record)
+            new_files.append(record)
+            page_new_files.append(record)
+            if batch_size is not None and len(new_files) >= batch_size:
+                break
+    return page_new_files
 
-async def _get_max_page(page):
-    print("Finding total pages...")
-    await _load_dataset_page(page, 0)
 
-    last_link = await page.query_selector('a[aria-label="Last page"]')
-    if last_link:
-        href = await last_link.get_attribute("href")
-        max_page = int(href.split("page=")[1])
-        print(f"Found {max_page + 1} pages (0 to {max_page})")
-        return max_page
+async def _queue_files(download_queue, records):
+    """Hand undownloaded records to the download workers; waits while the queue is full."""
+    for file_info in records:
+        if not file_info["d"]:
+            await download_queue.put(file_info)
 
-    print("Could not find last page link, using manual max...")
-    return 20500  # Dataset 9 has ~20,450 pages
 
+async def _queue_page_files(download_queue, page_new_files, page_num):
+    if not page_new_files:
+        return
+    print(f"  Queueing {len(page_new_files)} new files from page {page_num} for download...")
+    await _queue_files(download_queue, page_new_files)
 
-async def _scrape_pages_for_batch(batch_size, all_files, file_set, state):
-    """Scrape pages until we collect batch_size new files or reach the end."""
-    new_files = []
-    existing_files = _existing_file_names()
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=HEADLESS, slow_mo=SLOW_MO_MS)
-        context = await browser.new_context(
-            user_agent=USER_AGENT,
-            locale="en-US",
-            timezone_id="America/New_York",
-            extra_http_headers=EXTRA_HEADERS
-        )
+async def _recover_http_session(browser, session, page_num):
+    """Let Chromium load a page HTTP was denied, then hand its cookies over and close it.
 
-        await _add_age_cookies(context)
+    Returns False if the browser is denied too.
+    """
+    page = await browser.start()
+    await _load_dataset_page(page, page_num, check_gate=not browser.age_verified)
+    if await _page_is_access_denied(page):
+        return False
+    session.cookie_jar.update_cookies(_cookie_dict_from_list(await browser.cookies()))
+    await browser.close()
+    return True
 
-        page = await context.new_page()
-        await _ensure_age_verified(page)
 
-        # Navigate sequentially via UI to keep Akamai session happy.
-        await page.goto(f"{BASE_URL}?page=0", timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded")
-        await _maybe_accept_age_gate(page)
+async def _scrape_pages_for_batch(browser, session, download_queue, batch_size, all_files, file_set, state):
+    """Scrape pages until we collect batch_size new files or reach the end."""
+    new_files = []
+    existing_files = _existing_files()
+    current_page = state.get("next_page", 0)
+    sem = asyncio.BoundedSemaphore(SCRAPE_CONCURRENCY)
+    bucket = TokenBucket(SCRAPE_RATE, SCRAPE_CONCURRENCY)
+    window = SCRAPE_CONCURRENCY
+    denials = 0
+    clean_pages = 0
+    recovered_page = None
+    # Sliding window: up to `window` fetches run ahead of the page being ingested,
+    # and each ingested page frees a slot for the next one.
+    in_flight = deque()
+    next_fetch = current_page
+    # Out-of-range ?page=N just serves the last page again, so watch for repeats.
+    previous_links = None
+
+    def cancel_in_flight():
+        nonlocal next_fetch
+        while in_flight:
+            in_flight.popleft()[1].cancel()
+        next_fetch = current_page
+
+    # Listing pages are static HTML; plain HTTP with the age cookie is enough.
+    if "json_endpoint" not in state:
+        print("Looking for a JSON listing endpoint...")
+        state["json_endpoint"] = await _discover_json_endpoint(browser, session)
+        print(f"  Using {state['json_endpoint'] or 'HTML listing pages'}")
+        await _save_state(state)
+
+    if state.get("json_endpoint") and state.get("max_page") is None:
+        # JSON bodies carry no pager, so take the page count from page 0's HTML first.
+        html, body = await asyncio.gather(
+            _fetch_listing_html(session, sem, bucket, 0),
+            _fetch_listing_html(session, sem, bucket, 0, state["json_endpoint"])
+        )
+        if html is not None and not _is_access_denied(html):
+            state["max_page"] = _max_page_from_html(html)
+            # That count only carries over if both page 0s list the same number of files.
+            if body is None or len(_extract_listing_links(body, True)) != len(_extract_links_from_html(html)):
+                print("  JSON endpoint pages don't line up with the HTML pager; using HTML listing pages.")
+                state["json_endpoint"] = None
 
-        # Advance to the resume page using the "Next page" button to preserve cookies/tokens.
-        target_page = state.get("next_page", 0)
-        current_page = 0
-        while current_page < target_page:
-            next_btn = page.get_by_role("link", name="Next page")
-            if await next_btn.count() == 0:
-                next_btn = page.locator('a[aria-label="Next page"]')
-            if await next_btn.count() == 0:
+    try:
+        while batch_size is None or len(new_files) < batch_size:
+            max_page = state.get("max_page")
+            if max_page is None:
+                # No pager seen yet; never walk past the known size of the dataset.
+                max_page = MANUAL_MAX_PAGE
+            if current_page > max_page:
+                print(f"Reached last page ({max_page}); stopping.")
                 break
-            await next_btn.first.click()
-            await page.wait_for_load_state("domcontentloaded")
-            current_page += 1
 
-        # Main loop: click Next for each subsequent page
-        while batch_size is None or len(new_files) < batch_size:
-            print(f"Scraping page {current_page}...")
+            json_endpoint = state.get("json_endpoint")
+            while len(in_flight) < window and next_fetch <= max_page:
+                task = asyncio.create_task(
+                    _fetch_listing_html(session, sem, bucket, next_fetch, json_endpoint or BASE_URL)
+                )
+                in_flight.append((next_fetch, task))
+                next_fetch += 1
+
+            # Ingest strictly in page order so next_page only ever moves forward.
+            page_num, task = in_flight.popleft()
+            html = await task
+            if html is None:
+                print(f"  Could not fetch page {page_num}. Stopping for resume.")
+                break
 
-            if await _page_is_access_denied(page):
-                html = await page.content()
-                _save_debug_html(html, current_page)
-                print("  Access denied detected. Stopping for resume.")
+            if _is_access_denied(html):
+                _save_debug_html(html, page_num)
+                cancel_in_flight()
+                clean_pages = 0
+                # Denied again right after fresh cookies: go straight to the browser.
+                if window > 1 and page_num != recovered_page:
+                    # Likely tripped by our own concurrency; narrow the window and back off.
+                    window = max(1, window // 2)
+                    denials += 1
+                    backoff = min(60, 2 ** denials)
+                    print(f"  Access denied on page {page_num}; retrying in {backoff}s with {window} pages in flight.")
+                    bucket.penalize(backoff)
+                    continue
+                if page_num != recovered_page:
+                    print(f"  Access denied over HTTP. Refreshing cookies in the browser on page {page_num}.")
+                    if await _recover_http_session(browser, session, page_num):
+                        recovered_page = page_num
+                        window = SCRAPE_CONCURRENCY
+                        denials = 0
+                        continue
+                print("  Access denied over HTTP. Falling back to browser.")
+                await _save_state(state)
+                await _scrape_pages_browser(browser, session, download_queue, bucket, batch_size, all_files, file_set, state, existing_files, new_files)
                 break
 
-            links = await _collect_links_from_page(page)
+            links = _extract_listing_links(html, json_endpoint is not None)
+            if not links and json_endpoint:
+                # The endpoint stopped yielding files; refetch from here as HTML.
+                print("  JSON endpoint returned no files; switching back to HTML listing pages.")
+                state["json_endpoint"] = None
+                cancel_in_flight()
+                continue
             if not links:
-                html = await page.content()
-                _save_debug_html(html, current_page)
-                print(f"No files found on page {current_page}, stopping.")
+                _save_debug_html(html, page_num)
+                print(f"No files found on page {page_num}, stopping.")
                 break
 
-            page_new_files = []
-            for href in links:
-                filename = href.split("/")[-1]
-                if filename not in file_set:
-                    file_set.add(filename)
-                    record = {
-                        "filename": filename,
-                        "url": f"https://www.justice.gov{href}" if href.startswith("/") else href,
-                        "downloaded": filename in existing_files
-                    }
-                    all_files.append(record)
-                    new_files.append(record)
-                    page_new_files.append(record)
-                    if batch_size is not None and len(new_files) >= batch_size:
-                        break
+            if links == previous_links:
+                if json_endpoint:
+                    # The endpoint may be ignoring ?page=; refetch from here as HTML.
+                    print(f"  JSON page {page_num} repeats page {page_num - 1}; switching back to HTML listing pages.")
+                    state["json_endpoint"] = None
+                    previous_links = None
+                    cancel_in_flight()
+                    continue
+                if state.get("max_page") is None:
+                    state["max_page"] = page_num - 1
+                print(f"Page {page_num} repeats page {page_num - 1}; treating it as past the end.")
+                break
+            previous_links = links
 
-            print(f"  Found {len(links)} links, total unique files: {len(all_files)}")
+            found_max = _max_page_from_html(html)
+            if found_max is not None and found_max != state.get("max_page"):
+                state["max_page"] = found_max
 
-            if page_new_files:
-                print(f"  Downloading {len(page_new_files)} new files from page {current_page}...")
-                downloaded, skipped, failed = await _download_batch(page_new_files, all_files)
-                _save_index(all_files)
-                if failed > 0:
-                    print("  Some downloads failed on this page; will resume later.")
+            print(f"Page {page_num}:")
+            page_new_files = _add_new_records(links, all_files, file_set, existing_files, new_files, batch_size)
+            print(f"  Found {len(links)} links, total unique files: {len(all_files)}")
+            await _queue_page_files(download_queue, page_new_files, page_num)
 
-            current_page += 1
+            current_page = page_num + 1
             state["next_page"] = current_page
-            _save_state(state)
-            _save_index(all_files)
-
-            # Move to next page via UI. If no next button, stop.
-            next_btn = page.get_by_role("link", name="Next page")
-            if await next_btn.count() == 0:
-                next_btn = page.locator('a[aria-label="Next page"]')
-            if await next_btn.count() == 0:
-                print("No Next page button; stopping.")
+            clean_pages += 1
+            if window < SCRAPE_CONCURRENCY and clean_pages >= SCRAPE_WINDOW_RECOVER_PAGES:
+                window = min(SCRAPE_CONCURRENCY, window * 2)
+                clean_pages = 0
+                if window == SCRAPE_CONCURRENCY:
+                    denials = 0
+                print(f"  {SCRAPE_WINDOW_RECOVER_PAGES} clean pages; widening to {window} pages in flight.")
+            if not json_endpoint and not NEXT_PAGE_RE.search(_as_bytes(html)):
+                state["max_page"] = page_num
+                print("No Next page link; stopping.")
                 break
-            await next_btn.first.click()
-            await page.wait_for_load_state("domcontentloaded")
-            await page.wait_for_timeout(800 + random.randint(0, 800))
-
-        await browser.close()
+            if current_page % SCRAPE_CONCURRENCY == 0:
+                await _save_state(state)
+    finally:
+        cancel_in_flight()
 
+    await _save_state(state)
     return new_files
+
+
+async def _scrape_pages_browser(browser, session, download_queue, bucket, batch_size, all_files, file_set, state, existing_files, new_files):
+    """Browser fallback for when plain HTTP is blocked; appends to new_files in place."""
+    page = await browser.start()
+
+    # Cookies and the age gate are already settled, so jump straight to the resume page.
+    target_page = state.get("next_page", 0)
+    current_page = target_page
+    await _load_dataset_page(page, target_page, check_gate=not browser.age_verified)
+
+    if target_page > 0 and await _page_is_access_denied(page):
+        # Navigate sequentially via UI to keep Akamai session happy.
+        print(f"  Direct load of page {target_page} was denied; walking there via Next page.")
+        await page.goto(f"{BASE_URL}?page=0", timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded")
+        await _maybe_accept_age_gate(page)
+        current_page = 0
+        while current_page < target_page and await _click_next_page(page):
+            current_page += 1
+
+    # Main loop: click Next for each subsequent page
+    while batch_size is None or len(new_files) < batch_size:
+        print(f"Scraping page {current_page} (browser)...")
+
+        # One CDP round-trip for the whole document, then parse locally.
+        html = await page.content()
+        if _is_access_denied(html):
+            _save_debug_html(html, current_page)
+            browser.age_verified = False
+            print("  Access denied detected. Stopping for resume.")
+            break
+
+        links = _extract_links_from_html(html)
+        if not links:
+            _save_debug_html(html, current_page)
+            print(f"No files found on page {current_page}, stopping.")
+            break
+
+        page_new_files = _add_new_records(links, all_files, file_set, existing_files, new_files, batch_size)
+        print(f"  Found {len(links)} links, total unique files: {len(all_files)}")
+        # Hand the live context's cookies (Akamai tokens rotate per page) to the HTTP downloads.
+        session.cookie_jar.update_cookies(_cookie_dict_from_list(await browser.cookies()))
+        await _queue_page_files(download_queue, page_new_files, current_page)
+
+        current_page += 1
+        state["next_page"] = current_page
+        await _save_state(state)
+
+        # Move to next page via UI. If no next button, stop.
+        await bucket.acquire()
+        if not await _click_next_page(page):
+            print("No Next page button; stopping.")
+            break
  
  
-async def _download_batch(batch, all_files):
+def _check_size_response(resp, retry_delay):
+    if resp.status in (429, 503):
+        # Same as a throttled GET: hold back every download, not just this one.
+        _DOWNLOAD_BUCKET.penalize(_retry_after_seconds(resp, retry_delay))
+        raise RuntimeError(f"HTTP {resp.status}")
+    if resp.status == 404:
+        raise FileNotFoundError("HTTP 404")
+
+
+async def _remote_size(session, url, retry_delay):
+    """Size of the remote file, or None if a 200 doesn't say.
+
+    Raises FileNotFoundError on 404 and RuntimeError on any other failure.
+    """
+    async with session.head(url, allow_redirects=True) as resp:
+        _check_size_response(resp, retry_delay)
+        if resp.status == 200:
+            value = resp.headers.get("Content-Length", "")
+            return int(value) if value.isdigit() else None
+    # Some servers refuse HEAD (403/405); ask for the first byte instead.
+    async with session.get(url, allow_redirects=True, headers={"Range": "bytes=0-0"}) as resp:
+        _check_size_response(resp, retry_delay)
+        if "text/html" in resp.headers.get("content-type", "").lower():
+            raise RuntimeError(f"HTTP {resp.status} with an HTML body")
+        if resp.status == 206:
+            # "bytes 0-0/12345"; the total may be "*" if the server doesn't know it.
+            total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+            return int(total) if total.isdigit() else None
+        if resp.status == 200:
+            # Range ignored; the headers are enough, the body is never read.
+            value = resp.headers.get("Content-Length", "")
+            return int(value) if value.isdigit() else None
+        raise RuntimeError(f"HTTP {resp.status}")
+
+
+async def _download_one(sem, session, file_info, label):
+    """Download a single file record. Returns "downloaded", "skipped" or "failed"."""
+    filename = _record_filename(file_info)
+    url = _record_url(file_info)
+    output_path = OUTPUT_DIR / filename
+    part_path = output_path.with_name(filename + ".part")
+    # ETag of the body being written to part_path, so a resume can't splice two versions.
+    etag_path = output_path.with_name(filename + ".etag")
+
+    if output_path.exists():
+        if file_info["d"]:
+            # Size-checked (or finished) on an earlier pass; don't spend a HEAD on it.
+            return "skipped"
+        local_size = output_path.stat().st_size
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            delay = 2 ** attempt
+            try:
+                await _DOWNLOAD_BUCKET.acquire()
+                async with sem:
+                    remote_size = await _remote_size(session, url, delay)
+                break
+            except FileNotFoundError:
+                print(f"  {filename}: HTTP 404, skipping (marked missing)")
+                _mark_downloaded(file_info, missing=True)
+                return "skipped"
+            except Exception as e:
+                print(f"  {filename}: size check attempt {attempt} failed: {e}")
+                await asyncio.sleep(delay)
+        else:
+            # Unknown is not complete; leave the record pending for the next run.
+            return "failed"
+        if remote_size is None or local_size == remote_size:
+            _mark_downloaded(file_info)
+            return "skipped"
+        print(f"  {filename}: {local_size} bytes on disk, server has {remote_size}; fetching the rest")
+        # Files from before .part downloads may be truncated; resume them as partials.
+        if local_size < remote_size:
+            os.replace(output_path, part_path)
+        else:
+            output_path.unlink()
+        _existing_files().discard(filename)
+
+    result = "failed"
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        delay = 2 ** attempt
+        try:
+            await _DOWNLOAD_BUCKET.acquire()
+            async with sem:
+                if attempt == 1:
+                    print(f"{label} Downloading {filename}...")
+                offset = part_path.stat().st_size if part_path.exists() else 0
+                headers = {"Range": f"bytes={offset}-"} if offset else None
+                if offset and etag_path.exists():
+                    # If the file changed since, the server ignores Range and sends it whole.
+                    headers["If-Range"] = etag_path.read_text()
+                async with session.get(url, allow_redirects=True, headers=headers) as resp:
+                    if resp.status == 404:
+                        print(f"  {filename}: HTTP 404, skipping (marked missing)")
+                        _mark_downloaded(file_info, missing=True)
+                        result = "skipped"
+                        break
+                    if resp.status in (429, 503):
+                        delay = _retry_after_seconds(resp, delay)
+                        _DOWNLOAD_BUCKET.penalize(delay)
+                        delay = 0  # the bucket now holds every download back
+                        raise RuntimeError(f"HTTP {resp.status}")
+                    if resp.status == 416:
+                        # Our partial no longer lines up with the remote file; start over.
+                        part_path.unlink()
+                        etag_path.unlink(missing_ok=True)
+                        raise RuntimeError("HTTP 416")
+                    if resp.status not in (200, 206):
+                        raise RuntimeError(f"HTTP {resp.status}")
+                    content_type = resp.headers.get("content-type", "").lower()
+                    if "text/html" in content_type:
+                        # Likely age gate or error page
+                        raise RuntimeError(f"HTML response: {content_type}")
+                    # Stream into a .part file so a crash never leaves a truncated PDF
+                    # under the final name (which would be skipped as complete).
+                    # 206 means the server honoured our Range, so append to the partial.
+                    mode = "ab" if resp.status == 206 else "wb"
+                    if resp.status == 200:
+                        etag = resp.headers.get("ETag", "")
+                        # Weak validators can't be used with If-Range.
+                        if etag and not etag.startswith("W/"):
+                            etag_path.write_text(etag)
+                        else:
+                            etag_path.unlink(missing_ok=True)
+                    async with aiofiles.open(part_path, mode) as f:
+                        async for chunk in resp.content.iter_any():
+                            if chunk:
+                                await f.write(chunk)
+                    os.replace(part_path, output_path)
+                    etag_path.unlink(missing_ok=True)
+                    _DOWNLOAD_BUCKET.succeed()
+            _existing_files().add(filename)
+            _mark_downloaded(file_info)
+            result = "downloaded"
+            break
+        except Exception as e:
+            print(f"  {filename}: download attempt {attempt} failed: {e}")
+            # Back off outside the semaphore so the other downloads keep going.
+            await asyncio.sleep(delay)
+
+    return result
+
+
+async def _download_batch(session, download_sem, batch):
     """Download a batch of file records."""
     if not batch:
         return 0, 0, 0
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    existing_files = _existing_file_names()
 
-    # Create an HTTP session for streaming large files without loading into memory
-    timeout = aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT_MS / 1000 + 60)
-    headers = {"User-Agent": USER_AGENT, **EXTRA_HEADERS}
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=HEADLESS, slow_mo=SLOW_MO_MS)
-        context = await browser.new_context(
-            user_agent=USER_AGENT,
-            locale="en-US",
-            timezone_id="America/New_York",
-            extra_http_headers=EXTRA_HEADERS
-        )
-        await _add_age_cookies(context)
-        page = await context.new_page()
-        await _ensure_age_verified(page)
-        context_cookies = await context.cookies()
-
-    cookie_jar = aiohttp.CookieJar()
-    cookie_jar.update_cookies(_cookie_dict_from_list(context_cookies))
-    async with aiohttp.ClientSession(headers=headers, timeout=timeout, cookie_jar=cookie_jar) as session:
-
-        downloaded = 0
-        skipped = 0
-        failed = 0
-
-        for i, file_info in enumerate(batch, start=1):
-            filename = file_info["filename"]
-            url = file_info["url"]
-            output_path = OUTPUT_DIR / filename
-
-            if output_path.exists() or filename in existing_files:
-                file_info["downloaded"] = True
-                skipped += 1
-                _save_index(all_files)
-                continue
+    tasks = [
+        asyncio.create_task(_download_one(download_sem, session, file_info, f"[{i}/{len(batch)}]"))
+        for i, file_info in enumerate(batch, start=1)
+    ]
+    # One file blowing up (disk full, bad record, ...) must not abort the rest.
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    downloaded = skipped = failed = 0
+    for file_info, result in zip(batch, results):
+        if result == "downloaded":
+            downloaded += 1
+        elif result == "skipped":
+            skipped += 1
+        else:
+            if isinstance(result, BaseException):
+                print(f"  {_record_filename(file_info)}: unexpected error: {result!r}")
+            failed += 1
+    # A finished batch is a checkpoint; don't leave its results waiting on the timer.
+    _INDEX_BUFFER.flush()
+    return downloaded, skipped, failed
 
-            print(f"[{i}/{len(batch)}] Downloading {filename}...")
-
-            success = False
-            for attempt in range(1, DOWNLOAD_RETRIES + 1):
-                try:
-                    async with session.get(url, allow_redirects=True) as resp:
-                        if resp.status == 404:
-                            print("  HTTP 404: skipping (marked missing)")
-                            file_info["downloaded"] = True
-                            file_info["missing"] = True
-                            skipped += 1
-                            success = True
-                            break
-                        if resp.status != 200:
-                            raise RuntimeError(f"HTTP {resp.status}")
-                        content_type = resp.headers.get("content-type", "").lower()
-                        if "text/html" in content_type:
-                            # Likely age gate or error page
-                            text_sample = await resp.text(errors="ignore")
-                            raise RuntimeError(f"HTML response: {content_type}")
-                        with open(output_path, "wb") as f:
-                            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
-                                if chunk:
-                                    f.write(chunk)
-                    file_info["downloaded"] = True
-                    downloaded += 1
-                    success = True
-                    break
-                except Exception as e:
-                    print(f"  Download attempt {attempt} failed: {e}")
-                    await asyncio.sleep(2 * attempt)
-
-            if not success:
-                failed += 1
-
-            _save_index(all_files)
-            await asyncio.sleep(0.3)
 
-    return downloaded, skipped, failed
+async def _download_worker(session, download_sem, download_queue, totals):
+    """Pull records off the queue and download them until cancelled."""
+    while True:
+        file_info = await download_queue.get()
+        try:
+            label = f"[{sum(totals.values()) + 1}]"
+            result = await _download_one(download_sem, session, file_info, label)
+        except Exception as e:
+            print(f"  {_record_filename(file_info)}: unexpected error: {e!r}")
+            result = "failed"
+        finally:
+            download_queue.task_done()
+        totals[result] += 1
 
 
 async def download_files(start_from=0):
     """Download PDFs from the index."""
-    if not INDEX_FILE.exists():
+    if not INDEX_FILE.exists() and not LEGACY_INDEX_FILE.exists():
         print("Index file not found. Run scrape first.")
         return
 
     all_files = _load_index()
     batch = all_files[start_from:]
-    downloaded, skipped, failed = await _download_batch(batch, all_files)
+    flusher = asyncio.create_task(_INDEX_BUFFER.run())
+    download_sem = asyncio.BoundedSemaphore(DOWNLOAD_CONCURRENCY)
+    try:
+        async with _http_session() as session:
+            downloaded, skipped, failed = await _download_batch(session, download_sem, batch)
+    finally:
+        flusher.cancel()
+        _compact_index(all_files)
 
-    _save_index(all_files)
     print(f"\nDone! Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}")
 
 
 async def auto_scrape_and_download(batch_size=BATCH_SIZE):
-    """Scrape in batches of N files, then download each batch before continuing."""
+    """Scrape and download at the same time: the scraper feeds a queue drained by download workers.
+
+    batch_size only sets how many new files are scraped between progress reports.
+    """
     all_files = _load_index()
-    file_set = {f["filename"] for f in all_files}
+    file_set = _load_file_set(all_files)
     state = _load_state()
+    browser = BrowserSession()
+    flusher = asyncio.create_task(_INDEX_BUFFER.run())
+    # One bound on open downloads (sockets + file handles) for the whole run.
+    download_sem = asyncio.BoundedSemaphore(DOWNLOAD_CONCURRENCY)
+    # Bounded, so a fast scraper waits for the downloaders instead of running far ahead.
+    download_queue = asyncio.Queue(maxsize=DOWNLOAD_QUEUE_SIZE)
+    totals = {"downloaded": 0, "skipped": 0, "failed": 0}
 
-    while True:
-        pending = [f for f in all_files if not f.get("downloaded")]
-        if pending:
-            batch = pending if batch_size is None else pending[:batch_size]
-            print(f"Downloading existing pending batch: {len(batch)} files")
-            downloaded, skipped, failed = await _download_batch(batch, all_files)
-            _save_index(all_files)
-            print(f"Batch done. Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}")
-            if failed > 0:
-                print("Some downloads failed. You can rerun to retry.")
-                break
-            continue
-
-        new_files = await _scrape_pages_for_batch(batch_size, all_files, file_set, state)
-        if not new_files:
-            print("No new files found to scrape. All done.")
-            break
+    try:
+        async with _http_session() as session:
+            workers = [
+                asyncio.create_task(_download_worker(session, download_sem, download_queue, totals))
+                for _ in range(DOWNLOAD_CONCURRENCY)
+            ]
+            # Files left over from earlier runs go in alongside whatever gets scraped now.
+            pending = [f for f in all_files if not f["d"]]
+            if pending:
+                print(f"Queueing {len(pending)} files pending from earlier runs.")
+            feeder = asyncio.create_task(_queue_files(download_queue, pending))
+            try:
+                while True:
+                    new_files = await _scrape_pages_for_batch(browser, session, download_queue, batch_size, all_files, file_set, state)
+                    if not new_files:
+                        print("No new files found to scrape.")
+                        break
+                    print(f"Scraped {len(new_files)} new files, {download_queue.qsize()} waiting to download.")
+                await feeder
+                # The browser isn't needed for the rest of the downloads.
+                await browser.close()
+                print("Waiting for downloads to finish...")
+                await download_queue.join()
+            finally:
+                feeder.cancel()
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(feeder, *workers, return_exceptions=True)
+    finally:
+        flusher.cancel()
+        await browser.close()
+        _compact_index(all_files)
 
-        print(f"Scraped {len(new_files)} new files. Downloading batch...")
-        downloaded, skipped, failed = await _download_batch(new_files, all_files)
-        _save_index(all_files)
-        print(f"Batch done. Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}")
-        if failed > 0:
-            print("Some downloads failed. You can rerun to retry.")
-            break
+    print(f"\nDone! Downloaded: {totals['downloaded']}, Skipped: {totals['skipped']}, Failed: {totals['failed']}")
+    if totals["failed"] > 0:
+        print("Some downloads failed. You can rerun to retry.")
  
  
 async def main():
     import sys
+    global PRETTY_JSON
 
     # Optional args:
     #   auto [batch_size]
     #   download [start_index]
-    if len(sys.argv) < 2:
+    #   --pretty (anywhere) indents the state file
+    argv = [a for a in sys.argv[1:] if a != "--pretty"]
+    PRETTY_JSON = len(argv) < len(sys.argv) - 1
+    if len(argv) < 1:
         cmd = "auto"
         args = []
     else:
-        cmd = sys.argv[1].lower()
-        args = sys.argv[2:]
+        cmd = argv[0].lower()
+        args = argv[1:]
 
     if cmd == "auto":
         if len(args) > 0 and args[0].lower() not in ("none", "all"):
@@ -466,7 +1257,11 @@ async def main():
         print("Usage:")
         print("  python script.py auto [batch_size|all]   - Scrape/download in batches (default: all)")
         print("  python script.py download [start]        - Download from index starting at file #start")
+        print("  --pretty                                 - Indent the state file for reading by hand")
  
  
 if __name__ == '__main__':
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())